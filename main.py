@@ -1,28 +1,54 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional
-from services.workoutGeneration import generate_workout_plan
-from services.mealPlanGeneration import generate_meal_plan
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+import hmac
+import logging
+from typing import Dict, List, Literal, Optional
+from services.workoutGeneration import (
+    MAX_PROGRAM_WEEKS,
+    build_workout_structure,
+    iter_workout_plan,
+    patch_workout_structure,
+    render_workout_plan,
+    structure_workout_plan,
+)
+from services.mealPlanGeneration import (
+    MAX_PLAN_DAYS,
+    build_meal_structure,
+    iter_meal_plan,
+    patch_meal_structure,
+    render_meal_plan,
+    structure_meal_plan,
+)
+from services.staticSections import get_section
+from services.planCache import get_plan_cache, make_cache_key
+from services.planStore import get_plan_store
+from services.logConfig import RequestIdMiddleware, configure_logging
+from services.corsPolicy import CORSPolicyMiddleware
+from services.imageAssets import ATLAS_MAP_FILE, get_generated_path
+from services.requestProfiler import (
+    PROFILE_SECRET,
+    ProfilingMiddleware,
+    get_profile_path,
+    list_profiles,
+    profiling_enabled,
+)
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
+# The plan cache and store make blocking SQLite calls, so endpoints run them in the threadpool
+plan_cache = get_plan_cache()
+plan_store = get_plan_store()
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",
-        "http://localhost:5174",
-        "https://fit-formula-frontend-yrs4.vercel.app",
-        "https://fit-formula-frontend.vercel.app",
-        "https://fit-formula-frontend-yrs4-3lzit5boz-samireyes-projects.vercel.app",
-        "https://fit-formula-frontend-yrs4-git-feature-614831-samireyes-projects.vercel.app"
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestIdMiddleware)
+# CORS is applied to every route in one place; preflight requests never reach the router
+app.add_middleware(CORSPolicyMiddleware)
 
 class WorkoutRequest(BaseModel):
     fitness_level: str
@@ -31,6 +57,8 @@ class WorkoutRequest(BaseModel):
     time_per_session: int
     sessions_per_week: int
     medical_conditions: Optional[str] = None
+    weeks: int = Field(1, ge=1, le=MAX_PROGRAM_WEEKS)
+    format: Literal["markdown", "structured"] = "markdown"
 
 class MealPlanRequest(BaseModel):
     age: int
@@ -40,6 +68,62 @@ class MealPlanRequest(BaseModel):
     activity_level: str
     goal: str
     dietary_restrictions: List[str]
+    days: int = Field(1, ge=1, le=MAX_PLAN_DAYS)
+    format: Literal["markdown", "structured"] = "markdown"
+
+def get_workout_params(workout_request: WorkoutRequest) -> Dict:
+    return {
+        "fitness_level": workout_request.fitness_level,
+        "equipment_available": workout_request.available_equipment,
+        "goal": workout_request.goals,
+        "time_available": workout_request.time_per_session,
+        "sessions_per_week": workout_request.sessions_per_week,
+        "medical_conditions": workout_request.medical_conditions,
+        "weeks": workout_request.weeks
+    }
+
+def render_workout_content(structure: Dict, format: str) -> Dict:
+    # Structured plans reference static sections by ID instead of inlining them
+    if format == "structured":
+        return {"workout_plan": structure_workout_plan(structure)}
+    return {"workout_plan": render_workout_plan(structure)}
+
+def get_meal_params(meal_request: MealPlanRequest) -> Dict:
+    return {
+        "age": meal_request.age,
+        "gender": meal_request.gender,
+        "weight": meal_request.weight,
+        "height": meal_request.height,
+        "activity_level": meal_request.activity_level,
+        "goal": meal_request.goal,
+        "dietary_restrictions": meal_request.dietary_restrictions,
+        "days": meal_request.days
+    }
+
+def render_meal_content(structure: Dict, format: str) -> Dict:
+    if format == "structured":
+        meal_plan, calculations = structure_meal_plan(structure)
+    else:
+        meal_plan, calculations = render_meal_plan(structure)
+    return {
+        "meal_plan": meal_plan,
+        "calculations": calculations
+    }
+
+async def read_json_object(request: Request) -> Optional[Dict]:
+    """Return the request body if it is a JSON object, otherwise None"""
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+def invalid_body_response() -> JSONResponse:
+    return JSONResponse(status_code=400, content={"detail": "Request body must be a JSON object"})
+
+def validation_error_response(error: ValidationError) -> JSONResponse:
+    # Same shape as the errors FastAPI returns for invalid request models
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(error.errors())})
 
 @app.get("/")
 async def root():
@@ -49,90 +133,242 @@ async def root():
 async def test_endpoint():
     return {"message": "API is working!", "status": "ok"}
 
-@app.api_route("/api/workout", methods=["POST", "OPTIONS"])
-async def workout_endpoint(request: Request):
-    if request.method == "OPTIONS":
+@app.get("/api/sections/{section_id}")
+async def section_endpoint(section_id: str):
+    section = get_section(section_id)
+    if section is None:
         return JSONResponse(
-            content={"message": "OK"},
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "POST, OPTIONS",
-                "Access-Control-Allow-Headers": "*",
-            },
+            status_code=404,
+            content={"detail": "Section not found"},
         )
-    
+
+    # Section IDs are content hashes, so a given ID never changes
+    return JSONResponse(
+        content=section,
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{section_id}"',
+        },
+    )
+
+@app.get("/api/plans/{plan_id}")
+async def plan_endpoint(plan_id: str, request: Request):
+    etag = f'"{plan_id}"'
+    headers = {
+        "Cache-Control": "private, no-cache",
+        "ETag": etag,
+    }
+
+    plan = await run_in_threadpool(plan_store.get_plan, plan_id)
+    if plan is None:
+        return JSONResponse(
+            status_code=404,
+            content={"detail": "Plan not found"},
+        )
+
+    # Plan IDs are content hashes, so a matching ETag means the client's copy is current.
+    # If-None-Match uses weak comparison, so a W/ prefix is ignored.
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]:
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(content={**plan["content"], "plan_id": plan_id}, headers=headers)
+
+@app.patch("/api/plans/{plan_id}")
+async def patch_plan_endpoint(plan_id: str, request: Request):
+    plan = await run_in_threadpool(plan_store.get_plan, plan_id)
+    if plan is None:
+        return JSONResponse(
+            status_code=404,
+            content={"detail": "Plan not found"},
+        )
+
+    # The body holds only the request fields that changed
+    changes = await read_json_object(request)
+    if changes is None:
+        return invalid_body_response()
+
     try:
-        workout_request = WorkoutRequest(**await request.json())
-        workout_plan = generate_workout_plan(
-            fitness_level=workout_request.fitness_level,
-            equipment_available=workout_request.available_equipment,
-            goal=workout_request.goals,
-            time_available=workout_request.time_per_session,
-            sessions_per_week=workout_request.sessions_per_week,
-            medical_conditions=workout_request.medical_conditions
+        # Plans saved before structures were stored are rebuilt in full.
+        # Rendering costs less than loading the stored structure, so the whole
+        # plan is re-rendered rather than splicing in cached fragments.
+        if plan["kind"] == "workout":
+            workout_request = WorkoutRequest(**{**plan["request"], **changes})
+            plan_request = workout_request.model_dump()
+            params = get_workout_params(workout_request)
+            if plan["structure"] is None:
+                structure = build_workout_structure(**params)
+            else:
+                structure = patch_workout_structure(plan["structure"], params)
+            content = render_workout_content(structure, workout_request.format)
+        else:
+            meal_request = MealPlanRequest(**{**plan["request"], **changes})
+            plan_request = meal_request.model_dump()
+            params = get_meal_params(meal_request)
+            if plan["structure"] is None:
+                structure = build_meal_structure(**params)
+            else:
+                structure = patch_meal_structure(plan["structure"], params)
+            content = render_meal_content(structure, meal_request.format)
+
+        content["plan_id"] = await run_in_threadpool(
+            plan_store.save_plan, plan["kind"], plan_request, content, structure
+        )
+        # A plan that wasn't saved has no ID to share with other workers through the cache
+        if content["plan_id"] is not None:
+            await run_in_threadpool(plan_cache.set, make_cache_key(plan["kind"], plan_request), content)
+        return JSONResponse(content=content)
+    except ValidationError as e:
+        return validation_error_response(e)
+    except Exception as e:
+        logger.exception("Error in PATCH /api/plans endpoint")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Failed to update plan: {str(e)}"},
         )
+
+@app.get("/api/images/atlas")
+async def image_atlas_endpoint():
+    path = get_generated_path(ATLAS_MAP_FILE)
+    if path is None:
+        return JSONResponse(status_code=404, content={"detail": "Image atlas has not been built"})
+    # The map is small and points at content-hashed atlas files, so only it needs revalidating
+    return FileResponse(path, media_type="application/json", headers={"Cache-Control": "public, max-age=300"})
+
+@app.get("/api/images/{filename:path}")
+async def image_endpoint(filename: str):
+    path = get_generated_path(filename)
+    if path is None:
+        return JSONResponse(status_code=404, content={"detail": "Image not found"})
+    if filename.startswith("atlas/"):
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, max-age=86400"
+    return FileResponse(path, headers={"Cache-Control": cache_control})
+
+def is_admin(request: Request) -> bool:
+    token = request.headers.get("x-admin-token", "")
+    # Compare bytes: compare_digest raises TypeError for non-ASCII strings
+    return bool(PROFILE_SECRET) and hmac.compare_digest(token.encode(), PROFILE_SECRET.encode())
+
+@app.get("/api/admin/profiles")
+async def profiles_endpoint(request: Request):
+    if not is_admin(request):
+        return JSONResponse(status_code=404, content={"detail": "Not found"})
+    return {"profiles": list_profiles()}
+
+@app.get("/api/admin/profiles/{name}")
+async def profile_endpoint(name: str, request: Request):
+    path = get_profile_path(name) if is_admin(request) else None
+    if path is None:
+        return JSONResponse(status_code=404, content={"detail": "Not found"})
+    return FileResponse(path, media_type="text/plain")
+
+@app.post("/api/workout")
+async def workout_endpoint(request: Request):
+    body = await read_json_object(request)
+    if body is None:
+        return invalid_body_response()
+
+    try:
+        workout_request = WorkoutRequest(**body)
+        cache_key = make_cache_key("workout", workout_request.model_dump())
+        content = await run_in_threadpool(plan_cache.get, cache_key)
+        if content is not None and not await run_in_threadpool(plan_store.refresh_plan, content["plan_id"]):
+            # The plan has expired from the store, so generate and save it again
+            content = None
+        if content is None:
+            structure = build_workout_structure(**get_workout_params(workout_request))
+            content = render_workout_content(structure, workout_request.format)
+            content["plan_id"] = await run_in_threadpool(
+                plan_store.save_plan, "workout", workout_request.model_dump(), content, structure
+            )
+            if content["plan_id"] is not None:
+                await run_in_threadpool(plan_cache.set, cache_key, content)
+        return JSONResponse(content=content)
+    except ValidationError as e:
+        return validation_error_response(e)
+    except Exception as e:
+        logger.exception("Error in /api/workout endpoint")
         return JSONResponse(
-            content={"workout_plan": workout_plan},
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "POST, OPTIONS",
-                "Access-Control-Allow-Headers": "*",
-            },
+            status_code=500,
+            content={"detail": f"Failed to generate workout plan: {str(e)}"},
         )
+
+@app.post("/api/workout/stream")
+async def workout_stream_endpoint(request: Request):
+    body = await read_json_object(request)
+    if body is None:
+        return invalid_body_response()
+
+    try:
+        workout_request = WorkoutRequest(**body)
+        # Weeks are derived and rendered one at a time as the response is sent
+        workout_plan = iter_workout_plan(**get_workout_params(workout_request))
+        return StreamingResponse(
+            workout_plan,
+            media_type="text/markdown",
+        )
+    except ValidationError as e:
+        return validation_error_response(e)
     except Exception as e:
-        print(f"Error in /api/workout endpoint: {str(e)}")
+        logger.exception("Error in /api/workout/stream endpoint")
         return JSONResponse(
             status_code=500,
             content={"detail": f"Failed to generate workout plan: {str(e)}"},
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "POST, OPTIONS",
-                "Access-Control-Allow-Headers": "*",
-            },
         )
 
-@app.api_route("/api/meal-plan", methods=["POST", "OPTIONS"])
+@app.post("/api/meal-plan")
 async def meal_plan_endpoint(request: Request):
-    if request.method == "OPTIONS":
+    body = await read_json_object(request)
+    if body is None:
+        return invalid_body_response()
+
+    try:
+        meal_request = MealPlanRequest(**body)
+        cache_key = make_cache_key("meal-plan", meal_request.model_dump())
+        content = await run_in_threadpool(plan_cache.get, cache_key)
+        if content is not None and not await run_in_threadpool(plan_store.refresh_plan, content["plan_id"]):
+            # The plan has expired from the store, so generate and save it again
+            content = None
+        if content is None:
+            structure = build_meal_structure(**get_meal_params(meal_request))
+            content = render_meal_content(structure, meal_request.format)
+            content["plan_id"] = await run_in_threadpool(
+                plan_store.save_plan, "meal-plan", meal_request.model_dump(), content, structure
+            )
+            if content["plan_id"] is not None:
+                await run_in_threadpool(plan_cache.set, cache_key, content)
+        return JSONResponse(content=content)
+    except ValidationError as e:
+        return validation_error_response(e)
+    except Exception as e:
+        logger.exception("Error in /api/meal-plan endpoint")
         return JSONResponse(
-            content={"message": "OK"},
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "POST, OPTIONS",
-                "Access-Control-Allow-Headers": "*",
-            },
+            status_code=500,
+            content={"detail": f"Failed to generate meal plan: {str(e)}"},
         )
-    
+
+@app.post("/api/meal-plan/stream")
+async def meal_plan_stream_endpoint(request: Request):
+    body = await read_json_object(request)
+    if body is None:
+        return invalid_body_response()
+
     try:
-        meal_request = MealPlanRequest(**await request.json())
-        meal_plan, calculations = generate_meal_plan(
-            age=meal_request.age,
-            gender=meal_request.gender,
-            weight=meal_request.weight,
-            height=meal_request.height,
-            activity_level=meal_request.activity_level,
-            goal=meal_request.goal,
-            dietary_restrictions=meal_request.dietary_restrictions
-        )
-        return JSONResponse(
-            content={
-                "meal_plan": meal_plan,
-                "calculations": calculations
-            },
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "POST, OPTIONS",
-                "Access-Control-Allow-Headers": "*",
-            },
+        meal_request = MealPlanRequest(**body)
+        # Days are rendered one at a time as the response is sent
+        meal_plan = iter_meal_plan(**get_meal_params(meal_request))
+        return StreamingResponse(
+            meal_plan,
+            media_type="text/markdown",
         )
+    except ValidationError as e:
+        return validation_error_response(e)
     except Exception as e:
-        print(f"Error in /api/meal-plan endpoint: {str(e)}")
+        logger.exception("Error in /api/meal-plan/stream endpoint")
         return JSONResponse(
             status_code=500,
             content={"detail": f"Failed to generate meal plan: {str(e)}"},
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "POST, OPTIONS",
-                "Access-Control-Allow-Headers": "*",
-            },
         )
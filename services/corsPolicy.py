@@ -0,0 +1,111 @@
+import os
+from typing import Iterable
+
+ALLOWED_ORIGINS = [
+    "http://localhost:5173",
+    "http://localhost:5174",
+    "https://fit-formula-frontend-yrs4.vercel.app",
+    "https://fit-formula-frontend.vercel.app",
+    "https://fit-formula-frontend-yrs4-3lzit5boz-samireyes-projects.vercel.app",
+    "https://fit-formula-frontend-yrs4-git-feature-614831-samireyes-projects.vercel.app"
+]
+ALLOWED_METHODS = ["GET", "POST", "PATCH", "OPTIONS"]
+# "*" allows any request header; preflights echo back the headers the browser asks for,
+# since a literal wildcard isn't honoured on credentialed requests
+ALLOWED_HEADERS = ["*"]
+EXPOSED_HEADERS = ["ETag", "X-Request-ID"]
+# How long browsers may reuse a preflight response before sending another
+CORS_MAX_AGE = int(os.environ.get("CORS_MAX_AGE", "86400"))
+
+class CORSPolicyMiddleware:
+    """ASGI middleware applying one CORS policy to every route.
+
+    Preflight requests are answered here, before routing. All header values
+    are encoded once up front, so a request costs a set lookup of its origin
+    plus a list concatenation. Every response varies by Origin, including
+    ones sent without CORS headers, so a shared cache never hands a response
+    stored for one origin to another.
+    """
+
+    def __init__(
+        self,
+        app,
+        allow_origins: Iterable[str] = ALLOWED_ORIGINS,
+        allow_methods: Iterable[str] = ALLOWED_METHODS,
+        allow_headers: Iterable[str] = ALLOWED_HEADERS,
+        expose_headers: Iterable[str] = EXPOSED_HEADERS,
+        max_age: int = CORS_MAX_AGE
+    ):
+        self.app = app
+        self.allow_origins = frozenset(origin.encode("latin-1") for origin in allow_origins)
+
+        self.vary_headers = [(b"vary", b"Origin")]
+        self.response_headers = [
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-expose-headers", ", ".join(expose_headers).encode("latin-1"))
+        ] + self.vary_headers
+        allow_headers = list(allow_headers)
+        self.allow_any_header = "*" in allow_headers
+        self.preflight_headers = [
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-allow-methods", ", ".join(allow_methods).encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"vary", b"Origin"),
+            (b"content-length", b"0")
+        ]
+        if not self.allow_any_header:
+            self.preflight_headers.append(
+                (b"access-control-allow-headers", ", ".join(allow_headers).encode("latin-1"))
+            )
+        self.rejected_headers = [
+            (b"vary", b"Origin"),
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", b"24")
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        preflight = False
+        requested_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                preflight = True
+            elif name == b"access-control-request-headers":
+                requested_headers = value
+
+        allowed = origin is not None and origin in self.allow_origins
+
+        if origin is not None and preflight and scope["method"] == "OPTIONS":
+            if allowed:
+                headers = [(b"access-control-allow-origin", origin)] + self.preflight_headers
+                if self.allow_any_header and requested_headers:
+                    headers.append((b"access-control-allow-headers", requested_headers))
+                await send({
+                    "type": "http.response.start",
+                    "status": 204,
+                    "headers": headers
+                })
+                await send({"type": "http.response.body", "body": b""})
+            else:
+                await send({"type": "http.response.start", "status": 400, "headers": self.rejected_headers})
+                await send({"type": "http.response.body", "body": b"Disallowed CORS origin\r\n"})
+            return
+
+        # Same-origin, non-browser and disallowed requests get no CORS headers
+        if allowed:
+            cors_headers = [(b"access-control-allow-origin", origin)] + self.response_headers
+        else:
+            cors_headers = self.vary_headers
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + cors_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
@@ -0,0 +1,25 @@
+import os
+from typing import Optional
+
+# Output of the build-time image pipeline in services/imageAtlas.py
+GENERATED_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "assets", "generated"))
+ATLAS_MAP_FILE = "atlas.json"
+# Exercise types with their own image, matched against exercise names in this
+# order; anything else uses the "default" image
+EXERCISE_IMAGE_TYPES = ("push", "squat", "plank", "lunge", "crunch")
+
+def get_exercise_type(exercise_name: str) -> str:
+    """Determine the exercise image type, which is also its sprite name in the atlas, from an exercise name"""
+    exercise_name = exercise_name.lower()
+    for exercise_type in EXERCISE_IMAGE_TYPES:
+        if exercise_type in exercise_name:
+            return exercise_type
+    return "default"
+
+def get_generated_path(filename: str, output_dir: str = GENERATED_DIR) -> Optional[str]:
+    """Resolve a generated image file, refusing anything outside the output directory"""
+    root = os.path.realpath(output_dir)
+    path = os.path.realpath(os.path.join(root, filename))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
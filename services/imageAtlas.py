@@ -0,0 +1,109 @@
+"""Build-time pipeline for exercise images.
+
+Renders every exercise type in parallel, in several sizes and in PNG and
+WebP, and packs the card-size images into a single sprite atlas with a JSON
+coordinate map. Run it as part of the build:
+
+    python -m services.imageAtlas
+"""
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from PIL import Image, features
+from services.imageAssets import ATLAS_MAP_FILE, GENERATED_DIR
+from services.imageGeneration import EXERCISE_IMAGES, IMAGE_SIZE, render_exercise_image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    "thumbnail": 96,
+    "card": 200,
+    "full": IMAGE_SIZE
+}
+IMAGE_FORMATS = {
+    "png": {"format": "PNG", "optimize": True},
+    "webp": {"format": "WEBP", "quality": 85, "method": 6}
+}
+# Size whose images are packed into the sprite atlas
+ATLAS_VARIANT = "card"
+
+def _encode(img: Image.Image, extension: str) -> bytes:
+    buffered = io.BytesIO()
+    img.save(buffered, **IMAGE_FORMATS[extension])
+    return buffered.getvalue()
+
+def render_variants(exercise_type: str, output_dir: str = GENERATED_DIR) -> Dict[str, Dict[str, str]]:
+    """Render and save every size and format of one exercise image, returning their paths"""
+    # Figures are drawn at full size, so smaller variants are scaled down from it
+    full = render_exercise_image(exercise_type)
+    variants = {}
+    for variant, size in IMAGE_VARIANTS.items():
+        img = full if size == IMAGE_SIZE else full.resize((size, size), Image.LANCZOS)
+        os.makedirs(os.path.join(output_dir, variant), exist_ok=True)
+        variants[variant] = {}
+        for extension in IMAGE_FORMATS:
+            filename = f"{variant}/{exercise_type}.{extension}"
+            with open(os.path.join(output_dir, filename), "wb") as f:
+                f.write(_encode(img, extension))
+            variants[variant][extension] = filename
+    return variants
+
+def build_atlas(variants: Dict[str, Dict], output_dir: str = GENERATED_DIR) -> Dict:
+    """Pack the atlas-size images into one sprite sheet and describe where each sprite is"""
+    size = IMAGE_VARIANTS[ATLAS_VARIANT]
+    exercise_types = sorted(variants)
+    columns = math.ceil(math.sqrt(len(exercise_types)))
+    rows = math.ceil(len(exercise_types) / columns)
+
+    atlas = Image.new("RGB", (columns * size, rows * size))
+    sprites = {}
+    for index, exercise_type in enumerate(exercise_types):
+        x, y = (index % columns) * size, (index // columns) * size
+        with Image.open(os.path.join(output_dir, variants[exercise_type][ATLAS_VARIANT]["png"])) as img:
+            atlas.paste(img, (x, y))
+        sprites[exercise_type] = {"x": x, "y": y, "width": size, "height": size}
+
+    # Atlas files are named by content hash so they can be cached indefinitely
+    files = {}
+    for extension in IMAGE_FORMATS:
+        data = _encode(atlas, extension)
+        filename = f"atlas/atlas-{hashlib.sha256(data).hexdigest()[:12]}.{extension}"
+        os.makedirs(os.path.join(output_dir, "atlas"), exist_ok=True)
+        with open(os.path.join(output_dir, filename), "wb") as f:
+            f.write(data)
+        files[extension] = filename
+
+    return {
+        "atlas": files,
+        "width": atlas.width,
+        "height": atlas.height,
+        "sprites": sprites,
+        "variants": variants
+    }
+
+def build_image_assets(output_dir: str = GENERATED_DIR, workers: Optional[int] = None) -> Dict:
+    """Render all exercise images across a process pool, then write the atlas and its map"""
+    if not features.check("webp"):
+        raise RuntimeError("Pillow was built without WebP support; see requirements-build.txt")
+
+    exercise_types = list(EXERCISE_IMAGES)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(render_variants, exercise_types, [output_dir] * len(exercise_types))
+        variants = dict(zip(exercise_types, results))
+
+    atlas_map = build_atlas(variants, output_dir)
+    with open(os.path.join(output_dir, ATLAS_MAP_FILE), "w") as f:
+        json.dump(atlas_map, f, indent=2)
+    logger.info("Built %d exercise images and atlas in %s", len(exercise_types), output_dir)
+    return atlas_map
+
+if __name__ == "__main__":
+    from services.logConfig import configure_logging
+
+    configure_logging()
+    build_image_assets()
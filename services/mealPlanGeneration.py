@@ -1,4 +1,6 @@
-from typing import List, Tuple, Dict
+import math
+from typing import Dict, Iterator, List, Tuple
+from services.staticSections import register_section
 
 def calculate_bmr(weight: float, height: float, age: int, gender: str) -> float:
     """Calculate Basal Metabolic Rate using the Mifflin-St Jeor Equation"""
@@ -33,213 +35,420 @@ def calculate_target_calories(tdee: float, goal: str) -> float:
     }
     return tdee + goal_adjustments.get(goal.lower(), 0)
 
-def generate_meal_plan(
-    age: int,
-    gender: str,
-    weight: float,
-    height: float,
-    activity_level: str,
-    goal: str,
-    dietary_restrictions: List[str]
-) -> Tuple[str, Dict[str, float]]:
-    """Generate a personalized meal plan based on user inputs"""
-    
-    # Calculate caloric needs
-    bmr = calculate_bmr(weight, height, age, gender)
-    tdee = calculate_tdee(bmr, activity_level)
-    target_calories = calculate_target_calories(tdee, goal)
-    
-    # Format dietary restrictions
-    restrictions_text = ", ".join(dietary_restrictions) if dietary_restrictions else "None"
-
-    # Define meal options based on dietary preferences
-    meal_options = {
-        "carnivore": {
-            "breakfast": [
-                "Eggs and bacon",
-                "Ground beef with eggs",
-                "Steak and eggs",
-                "Pork chops",
-                "Beef liver"
-            ],
-            "snacks": [
-                "Beef jerky",
-                "Hard-boiled eggs",
-                "Pork rinds",
-                "Bone broth"
-            ],
-            "lunch_dinner": [
-                "Ribeye steak",
-                "Ground beef patties",
-                "Chicken thighs",
-                "Lamb chops",
-                "Turkey legs",
-                "Beef brisket"
-            ]
-        },
-        "pescatarian": {
-            "breakfast": [
-                "Greek yogurt with berries",
-                "Smoked salmon with eggs",
-                "Tuna avocado toast",
-                "Sardines on whole grain bread"
-            ],
-            "snacks": [
-                "Mixed nuts",
-                "Seaweed snacks",
-                "Cottage cheese",
-                "Canned sardines"
-            ],
-            "lunch_dinner": [
-                "Grilled salmon",
-                "Baked cod",
-                "Shrimp stir-fry",
-                "Tuna steak",
-                "Sea bass with vegetables",
-                "Mussels in garlic sauce"
-            ]
-        }
+MAX_PLAN_DAYS = 28
+
+# Define meal options based on dietary preferences
+MEAL_OPTIONS = {
+    "carnivore": {
+        "breakfast": [
+            "Eggs and bacon",
+            "Ground beef with eggs",
+            "Steak and eggs",
+            "Pork chops",
+            "Beef liver"
+        ],
+        "snacks": [
+            "Beef jerky",
+            "Hard-boiled eggs",
+            "Pork rinds",
+            "Bone broth"
+        ],
+        "lunch_dinner": [
+            "Ribeye steak",
+            "Ground beef patties",
+            "Chicken thighs",
+            "Lamb chops",
+            "Turkey legs",
+            "Beef brisket"
+        ]
+    },
+    "pescatarian": {
+        "breakfast": [
+            "Greek yogurt with berries",
+            "Smoked salmon with eggs",
+            "Tuna avocado toast",
+            "Sardines on whole grain bread"
+        ],
+        "snacks": [
+            "Mixed nuts",
+            "Seaweed snacks",
+            "Cottage cheese",
+            "Canned sardines"
+        ],
+        "lunch_dinner": [
+            "Grilled salmon",
+            "Baked cod",
+            "Shrimp stir-fry",
+            "Tuna steak",
+            "Sea bass with vegetables",
+            "Mussels in garlic sauce"
+        ]
+    }
+}
+
+# How many options each diet draws from every meal category per day
+DAILY_PICKS = {
+    "carnivore": {"breakfast": 2, "snacks": 4, "lunch_dinner": 4},
+    "pescatarian": {"breakfast": 2, "snacks": 3, "lunch_dinner": 2}
+}
+
+def get_rotation_step(option_count: int, picks: int) -> int:
+    """How far a category's window of options moves from one day to the next"""
+    return picks if picks < option_count else 1
+
+def get_rotation_period(option_count: int, picks: int) -> int:
+    """Number of days before a category's rotation comes back to the same window"""
+    return option_count // math.gcd(get_rotation_step(option_count, picks), option_count)
+
+def build_rotation_schedule(
+    option_count: int,
+    picks: int,
+    days: int,
+    cycle_length: int = 0
+) -> List[Tuple[int, ...]]:
+    """Precompute which option indices to serve on each day of a rotating plan.
+
+    Each day starts where the previous day's window of `picks` options ended, so
+    consecutive days share no options as long as the category has at least twice
+    as many options as a day uses. Categories where a day uses every option
+    shift by one instead, so at least the order changes from day to day. With a
+    cycle_length, the window also moves on by one option every cycle_length days.
+    """
+    step = get_rotation_step(option_count, picks)
+    return [
+        tuple(
+            (day * step + (day // cycle_length if cycle_length else 0) + offset) % option_count
+            for offset in range(picks)
+        )
+        for day in range(days)
+    ]
+
+def build_diet_rotation(diet: str) -> Dict[str, List[Tuple[int, ...]]]:
+    """Precompute the rotation of every meal category of a diet.
+
+    The categories rotate with their own periods, so the whole day repeats once
+    they line up again, after the least common multiple of the periods. If that
+    comes before MAX_PLAN_DAYS, the first category is shifted by one option each
+    time they line up, so no two days of a plan are the same.
+    """
+    options = MEAL_OPTIONS[diet]
+    category_picks = DAILY_PICKS[diet]
+    cycle_length = math.lcm(*(
+        get_rotation_period(len(options[category]), picks)
+        for category, picks in category_picks.items()
+    ))
+    shifted = next(iter(category_picks)) if cycle_length < MAX_PLAN_DAYS else None
+    return {
+        category: build_rotation_schedule(
+            len(options[category]), picks, MAX_PLAN_DAYS,
+            cycle_length if category == shifted else 0
+        )
+        for category, picks in category_picks.items()
     }
 
-    # Select appropriate meal template based on dietary preferences
-    if "carnivore" in dietary_restrictions:
-        meals = meal_options["carnivore"]
-        meal_plan = f"""# Your Personalized Carnivore Meal Plan
-
-## Daily Nutritional Targets
-- **Target Calories:** {int(target_calories)} calories
-- **Dietary Preferences:** {restrictions_text}
-
-## Meal Schedule
-
-### Breakfast (30% of daily calories: {int(target_calories * 0.30)} cal)
-- {meals["breakfast"][0]}
-- {meals["breakfast"][1]}
-
-### Morning Snack (10% of daily calories: {int(target_calories * 0.10)} cal)
-- {meals["snacks"][0]}
-- {meals["snacks"][1]}
-
-### Lunch (30% of daily calories: {int(target_calories * 0.30)} cal)
-- {meals["lunch_dinner"][0]}
-- {meals["lunch_dinner"][1]}
-
-### Afternoon Snack (10% of daily calories: {int(target_calories * 0.10)} cal)
-- {meals["snacks"][2]}
-- {meals["snacks"][3]}
+ROTATION_SCHEDULES = {diet: build_diet_rotation(diet) for diet in DAILY_PICKS}
 
-### Dinner (20% of daily calories: {int(target_calories * 0.20)} cal)
-- {meals["lunch_dinner"][2]}
-- {meals["lunch_dinner"][3]}
+MEAL_PLAN_TITLES = {
+    "carnivore": "Carnivore Meal Plan",
+    "pescatarian": "Pescatarian Meal Plan",
+    "standard": "Meal Plan"
+}
 
-## Guidelines
-1. Focus on fatty cuts of meat for energy
+MEAL_GUIDELINES = {
+    "carnivore": """1. Focus on fatty cuts of meat for energy
 2. Include organ meats for nutrients
 3. Consider adding bone broth for minerals
 4. Salt to taste
 5. Eat when hungry, stop when full
-
-## Notes
-- This is a zero-carb, animal-based meal plan
-- Adjust portions to meet your caloric needs
-- Listen to your body and adjust meal timing as needed
-"""
-    elif "pescatarian" in dietary_restrictions:
-        meals = meal_options["pescatarian"]
-        meal_plan = f"""# Your Personalized Pescatarian Meal Plan
-
-## Daily Nutritional Targets
-- **Target Calories:** {int(target_calories)} calories
-- **Dietary Preferences:** {restrictions_text}
-
-## Meal Schedule
-
-### Breakfast (25% of daily calories: {int(target_calories * 0.25)} cal)
-- {meals["breakfast"][0]}
-- {meals["breakfast"][1]}
-
-### Morning Snack (15% of daily calories: {int(target_calories * 0.15)} cal)
-- {meals["snacks"][0]}
-- {meals["snacks"][1]}
-
-### Lunch (30% of daily calories: {int(target_calories * 0.30)} cal)
-- {meals["lunch_dinner"][0]}
-- Mixed green salad
-- Quinoa or brown rice
-
-### Afternoon Snack (10% of daily calories: {int(target_calories * 0.10)} cal)
-- {meals["snacks"][2]}
-- Fresh fruit
-
-### Dinner (20% of daily calories: {int(target_calories * 0.20)} cal)
-- {meals["lunch_dinner"][1]}
-- Steamed vegetables
-- Sweet potato or whole grain
-
-## Guidelines
-1. Include a variety of fish for omega-3s
+""",
+    "pescatarian": """1. Include a variety of fish for omega-3s
 2. Eat plenty of plant-based proteins
 3. Include whole grains and legumes
 4. Focus on healthy fats from fish, nuts, and oils
 5. Aim for 2-3 servings of fish per day
+""",
+    "standard": """1. Drink at least 8 glasses of water daily
+2. Eat every 3-4 hours
+3. Include protein with each meal
+4. Focus on whole, unprocessed foods
+5. Adjust portions to meet caloric goals
+"""
+}
 
-## Notes
-- Rotate between different types of fish for nutrient variety
+MEAL_NOTES = {
+    "carnivore": """- This is a zero-carb, animal-based meal plan
+- Adjust portions to meet your caloric needs
+- Listen to your body and adjust meal timing as needed
+""",
+    "pescatarian": """- Rotate between different types of fish for nutrient variety
 - Consider algae supplements for additional omega-3s
 - Include plant-based protein sources like legumes and quinoa
+""",
+    "standard": """- This meal plan is a template - adjust portions to meet your caloric needs
+- Listen to your body and adjust meal timing as needed
+- Consider tracking your meals using a food diary
 """
+}
+
+# Static sections for each diet, referenced by ID in structured responses
+MEAL_SECTIONS = {
+    diet: [
+        register_section("Guidelines", MEAL_GUIDELINES[diet]),
+        register_section("Notes", MEAL_NOTES[diet])
+    ]
+    for diet in MEAL_PLAN_TITLES
+}
+
+def get_diet(dietary_restrictions: List[str]) -> str:
+    """Select the meal template matching the user's dietary preferences"""
+    if "carnivore" in dietary_restrictions:
+        return "carnivore"
+    elif "pescatarian" in dietary_restrictions:
+        return "pescatarian"
+    return "standard"
+
+def get_day_options(diet: str, day_index: int) -> Dict[str, List[str]]:
+    """Look up the rotated meal options for one day of the plan"""
+    options = MEAL_OPTIONS[diet]
+    return {
+        category: [options[category][i] for i in schedule[day_index % MAX_PLAN_DAYS]]
+        for category, schedule in ROTATION_SCHEDULES[diet].items()
+    }
+
+def build_meal_day(diet: str, day_index: int, target_calories: float) -> Dict:
+    """Build the meals for a single day of the plan"""
+    if diet == "carnivore":
+        meals = get_day_options(diet, day_index)
+        schedule = [
+            ("Breakfast", 30, meals["breakfast"][0:2]),
+            ("Morning Snack", 10, meals["snacks"][0:2]),
+            ("Lunch", 30, meals["lunch_dinner"][0:2]),
+            ("Afternoon Snack", 10, meals["snacks"][2:4]),
+            ("Dinner", 20, meals["lunch_dinner"][2:4])
+        ]
+    elif diet == "pescatarian":
+        meals = get_day_options(diet, day_index)
+        schedule = [
+            ("Breakfast", 25, meals["breakfast"][0:2]),
+            ("Morning Snack", 15, meals["snacks"][0:2]),
+            ("Lunch", 30, [meals["lunch_dinner"][0], "Mixed green salad", "Quinoa or brown rice"]),
+            ("Afternoon Snack", 10, [meals["snacks"][2], "Fresh fruit"]),
+            ("Dinner", 20, [meals["lunch_dinner"][1], "Steamed vegetables", "Sweet potato or whole grain"])
+        ]
     else:
         # Original meal plan for other dietary preferences
-        meal_plan = f"""# Your Personalized Meal Plan
+        schedule = [
+            ("Breakfast", 25, ["Oatmeal with berries and nuts", "Greek yogurt", "Banana"]),
+            ("Morning Snack", 15, ["Apple with almond butter", "Handful of mixed nuts"]),
+            ("Lunch", 30, ["Grilled chicken breast", "Quinoa", "Steamed vegetables", "Olive oil dressing"]),
+            ("Afternoon Snack", 10, ["Carrot sticks with hummus", "String cheese"]),
+            ("Dinner", 20, ["Baked salmon", "Sweet potato", "Roasted broccoli", "Mixed green salad"])
+        ]
+
+    return {
+        "day": day_index + 1,
+        "meals": [
+            {
+                "name": name,
+                "percent": percent,
+                "calories": int(target_calories * percent / 100),
+                "items": items
+            }
+            for name, percent, items in schedule
+        ]
+    }
+
+def render_meal_day(day: Dict, heading: str = "## Meal Schedule") -> str:
+    """Render one day of meals as markdown"""
+    text = f"{heading}\n\n"
+    for meal in day["meals"]:
+        text += f"### {meal['name']} ({meal['percent']}% of daily calories: {meal['calories']} cal)\n"
+        text += "".join(f"- {item}\n" for item in meal["items"])
+        text += "\n"
+    return text
+
+def render_meal_header(diet: str, target_calories: float, dietary_restrictions: List[str]) -> str:
+    """Render the title and nutritional targets of a meal plan"""
+    # Format dietary restrictions
+    restrictions_text = ", ".join(dietary_restrictions) if dietary_restrictions else "None"
+
+    return f"""# Your Personalized {MEAL_PLAN_TITLES[diet]}
 
 ## Daily Nutritional Targets
 - **Target Calories:** {int(target_calories)} calories
 - **Dietary Preferences:** {restrictions_text}
 
-## Meal Schedule
+"""
 
-### Breakfast (25% of daily calories: {int(target_calories * 0.25)} cal)
-- Oatmeal with berries and nuts
-- Greek yogurt
-- Banana
+def render_meal_footer(diet: str) -> str:
+    """Render the guidelines and notes of a meal plan"""
+    return f"## Guidelines\n{MEAL_GUIDELINES[diet]}\n## Notes\n{MEAL_NOTES[diet]}"
 
-### Morning Snack (15% of daily calories: {int(target_calories * 0.15)} cal)
-- Apple with almond butter
-- Handful of mixed nuts
+def get_day_heading(day: Dict, days: int) -> str:
+    """Heading for a day of the plan; single-day plans keep the plain schedule heading"""
+    return "## Meal Schedule" if days == 1 else f"## Day {day['day']} Meal Schedule"
 
-### Lunch (30% of daily calories: {int(target_calories * 0.30)} cal)
-- Grilled chicken breast
-- Quinoa
-- Steamed vegetables
-- Olive oil dressing
+def build_meal_structure(
+    age: int,
+    gender: str,
+    weight: float,
+    height: float,
+    activity_level: str,
+    goal: str,
+    dietary_restrictions: List[str],
+    days: int = 1
+) -> Dict:
+    """Build a meal plan as data, before it's rendered in either response format"""
+    params = {
+        "age": age,
+        "gender": gender,
+        "weight": weight,
+        "height": height,
+        "activity_level": activity_level,
+        "goal": goal,
+        "dietary_restrictions": dietary_restrictions,
+        "days": days
+    }
+    bmr = calculate_bmr(weight, height, age, gender)
+    tdee = calculate_tdee(bmr, activity_level)
+    target_calories = calculate_target_calories(tdee, goal)
+    diet = get_diet(dietary_restrictions)
+
+    return {
+        "params": params,
+        "diet": diet,
+        "bmr": bmr,
+        "tdee": tdee,
+        "target_calories": target_calories,
+        "days": [
+            build_meal_day(diet, day_index, target_calories)
+            for day_index in range(days)
+        ]
+    }
 
-### Afternoon Snack (10% of daily calories: {int(target_calories * 0.10)} cal)
-- Carrot sticks with hummus
-- String cheese
+def patch_meal_structure(structure: Dict, params: Dict) -> Dict:
+    """Update a meal plan for changed parameters, rebuilding only what they affect.
+
+    A new diet needs new meals, but body stats and goals only change the
+    calorie figures, so the chosen meals are kept and just re-scaled. Changing
+    the number of days adds or drops days at the end.
+    """
+    old_params = structure["params"]
+    bmr = calculate_bmr(params["weight"], params["height"], params["age"], params["gender"])
+    tdee = calculate_tdee(bmr, params["activity_level"])
+    target_calories = calculate_target_calories(tdee, params["goal"])
+    diet = get_diet(params["dietary_restrictions"])
+    days = params["days"]
+
+    meal_days = structure["days"][:days]
+    if diet != structure["diet"]:
+        meal_days = [build_meal_day(diet, day_index, target_calories) for day_index in range(len(meal_days))]
+    elif any(params[key] != old_params[key] for key in ("age", "gender", "weight", "height", "activity_level", "goal")):
+        meal_days = [
+            {
+                **day,
+                "meals": [
+                    {**meal, "calories": int(target_calories * meal["percent"] / 100)}
+                    for meal in day["meals"]
+                ]
+            }
+            for day in meal_days
+        ]
+
+    meal_days += [build_meal_day(diet, day_index, target_calories) for day_index in range(len(meal_days), days)]
+
+    return {
+        "params": params,
+        "diet": diet,
+        "bmr": bmr,
+        "tdee": tdee,
+        "target_calories": target_calories,
+        "days": meal_days
+    }
 
-### Dinner (20% of daily calories: {int(target_calories * 0.20)} cal)
-- Baked salmon
-- Sweet potato
-- Roasted broccoli
-- Mixed green salad
+def get_calculations(structure: Dict) -> Dict[str, float]:
+    """Summarize the calorie calculations behind a meal plan"""
+    return {
+        "bmr": round(structure["bmr"], 2),
+        "tdee": round(structure["tdee"], 2),
+        "target_calories": round(structure["target_calories"], 2)
+    }
 
-## Guidelines
-1. Drink at least 8 glasses of water daily
-2. Eat every 3-4 hours
-3. Include protein with each meal
-4. Focus on whole, unprocessed foods
-5. Adjust portions to meet caloric goals
+def render_meal_plan(structure: Dict) -> Tuple[str, Dict[str, float]]:
+    """Render a meal plan structure as markdown"""
+    diet = structure["diet"]
+    meal_plan = render_meal_header(diet, structure["target_calories"], structure["params"]["dietary_restrictions"])
+    for day in structure["days"]:
+        meal_plan += render_meal_day(day, get_day_heading(day, len(structure["days"])))
+    meal_plan += render_meal_footer(diet)
+
+    return meal_plan, get_calculations(structure)
+
+def structure_meal_plan(structure: Dict) -> Tuple[Dict, Dict[str, float]]:
+    """Build the structured form of a meal plan, referring to static sections by ID.
+
+    The meal schedule (name, share of calories and calories) is the same every
+    day, so it is listed once and each day carries only its items, one list
+    per scheduled meal.
+    """
+    diet = structure["diet"]
+    schedule = [
+        {key: meal[key] for key in ("name", "percent", "calories")}
+        for meal in structure["days"][0]["meals"]
+    ]
+    meal_plan = {
+        "format": "structured",
+        "title": f"Your Personalized {MEAL_PLAN_TITLES[diet]}",
+        "targets": {
+            "calories": int(structure["target_calories"]),
+            "dietary_preferences": structure["params"]["dietary_restrictions"]
+        },
+        "schedule": schedule,
+        "days": [
+            {"day": day["day"], "meals": [meal["items"] for meal in day["meals"]]}
+            for day in structure["days"]
+        ],
+        "sections": MEAL_SECTIONS[diet]
+    }
 
-## Notes
-- This meal plan is a template - adjust portions to meet your caloric needs
-- Listen to your body and adjust meal timing as needed
-- Consider tracking your meals using a food diary
-"""
+    return meal_plan, get_calculations(structure)
 
-    calculations = {
-        "bmr": round(bmr, 2),
-        "tdee": round(tdee, 2),
-        "target_calories": round(target_calories, 2)
-    }
-    
-    return meal_plan, calculations
+def iter_meal_plan(
+    age: int,
+    gender: str,
+    weight: float,
+    height: float,
+    activity_level: str,
+    goal: str,
+    dietary_restrictions: List[str],
+    days: int = 1
+) -> Iterator[str]:
+    """Lazily render a meal plan, yielding the header, each day and the guidelines in turn"""
+    bmr = calculate_bmr(weight, height, age, gender)
+    tdee = calculate_tdee(bmr, activity_level)
+    target_calories = calculate_target_calories(tdee, goal)
+
+    diet = get_diet(dietary_restrictions)
+
+    yield render_meal_header(diet, target_calories, dietary_restrictions)
+
+    for day_index in range(days):
+        day = build_meal_day(diet, day_index, target_calories)
+        yield render_meal_day(day, get_day_heading(day, days))
+
+    yield render_meal_footer(diet)
+
+def generate_meal_plan(
+    age: int,
+    gender: str,
+    weight: float,
+    height: float,
+    activity_level: str,
+    goal: str,
+    dietary_restrictions: List[str],
+    days: int = 1
+) -> Tuple[str, Dict[str, float]]:
+    """Generate a personalized meal plan based on user inputs"""
+    return render_meal_plan(build_meal_structure(
+        age, gender, weight, height, activity_level, goal, dietary_restrictions, days
+    ))
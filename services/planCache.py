@@ -0,0 +1,222 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_BACKEND = os.environ.get("PLAN_CACHE_BACKEND", "sqlite")
+PLAN_CACHE_PATH = os.environ.get(
+    "PLAN_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "fit-formula-plan-cache.db")
+)
+PLAN_CACHE_MAX_ENTRIES = int(os.environ.get("PLAN_CACHE_MAX_ENTRIES", "2000"))
+PLAN_CACHE_MAX_BYTES = int(os.environ.get("PLAN_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# A cache miss is cheap, so don't keep requests waiting long on a locked database
+PLAN_CACHE_BUSY_TIMEOUT = float(os.environ.get("PLAN_CACHE_BUSY_TIMEOUT", "0.5"))
+# Recency only needs to be roughly right for LRU eviction, so reads refresh
+# last_used at most this often instead of writing on every hit
+PLAN_CACHE_TOUCH_INTERVAL = float(os.environ.get("PLAN_CACHE_TOUCH_INTERVAL", "60"))
+# Bump whenever generated plans or the shape of their content change so old entries are never served
+PLAN_CACHE_VERSION = 4
+
+def make_cache_key(kind: str, params: Dict) -> str:
+    """Build a cache key from the cache format version, the plan type and the request parameters"""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"v{PLAN_CACHE_VERSION}:{kind}:{canonical}".encode()).hexdigest()
+
+def connect_sqlite(path: str, timeout: float = 5) -> sqlite3.Connection:
+    """Open a SQLite database in WAL mode so several processes can read and write it"""
+    connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+class ThreadLocalConnection:
+    """Callable returning this thread's connection to a SQLite database, opening it on first use"""
+
+    def __init__(self, path: str, timeout: float = 5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads, so keep one per thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect_sqlite(self.path, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+class LocalPlanCache:
+    """In-process LRU cache, used when no shared store is available"""
+
+    def __init__(self, max_entries: int = PLAN_CACHE_MAX_ENTRIES, max_bytes: int = PLAN_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                return None
+            self._entries.move_to_end(key)
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict):
+        data = json.dumps(value)
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+
+            # Evict least recently used plans until we're back under both limits
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+class SQLitePlanCache:
+    """LRU plan cache in a file-backed SQLite database shared by every worker on the node"""
+
+    def __init__(
+        self,
+        path: str = PLAN_CACHE_PATH,
+        max_entries: int = PLAN_CACHE_MAX_ENTRIES,
+        max_bytes: int = PLAN_CACHE_MAX_BYTES
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._connection = ThreadLocalConnection(path, timeout=PLAN_CACHE_BUSY_TIMEOUT)
+
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS plan_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS plan_cache_last_used ON plan_cache (last_used)"
+            )
+            # Running totals kept up to date by triggers, so writes can check the
+            # limits without scanning the whole table
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS plan_cache_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    entries INTEGER NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            connection.execute("""
+                INSERT OR IGNORE INTO plan_cache_stats (id, entries, size)
+                SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM plan_cache
+            """)
+            connection.execute("""
+                CREATE TRIGGER IF NOT EXISTS plan_cache_insert AFTER INSERT ON plan_cache BEGIN
+                    UPDATE plan_cache_stats SET entries = entries + 1, size = size + new.size;
+                END
+            """)
+            connection.execute("""
+                CREATE TRIGGER IF NOT EXISTS plan_cache_update AFTER UPDATE OF size ON plan_cache BEGIN
+                    UPDATE plan_cache_stats SET size = size + new.size - old.size;
+                END
+            """)
+            connection.execute("""
+                CREATE TRIGGER IF NOT EXISTS plan_cache_delete AFTER DELETE ON plan_cache BEGIN
+                    UPDATE plan_cache_stats SET entries = entries - 1, size = size - old.size;
+                END
+            """)
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT value, last_used FROM plan_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+        except sqlite3.Error as e:
+            logger.warning("Plan cache read failed: %s", e)
+            return None
+
+        value, last_used = row
+        now = time.time()
+        if now - last_used > PLAN_CACHE_TOUCH_INTERVAL:
+            # A missed touch only makes eviction slightly less accurate, so it
+            # mustn't turn the hit into a miss
+            try:
+                connection.execute("UPDATE plan_cache SET last_used = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                logger.warning("Plan cache touch failed: %s", e)
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict):
+        data = json.dumps(value)
+        if len(data) > self.max_bytes:
+            return
+
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                # An upsert rather than INSERT OR REPLACE so the stats triggers see
+                # a replaced entry as an update instead of a silent delete
+                connection.execute("""
+                    INSERT INTO plan_cache (key, value, size, last_used) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET
+                        value = excluded.value, size = excluded.size, last_used = excluded.last_used
+                """, (key, data, len(data), time.time()))
+                self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning("Plan cache write failed: %s", e)
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Evict least recently used plans until the cache is back under both limits"""
+        while True:
+            entries, size = connection.execute(
+                "SELECT entries, size FROM plan_cache_stats WHERE id = 0"
+            ).fetchone()
+            if entries <= self.max_entries and size <= self.max_bytes:
+                return
+            # Walks the last_used index from the oldest entry rather than the whole table
+            count = max(entries - self.max_entries, 1)
+            connection.execute(
+                "DELETE FROM plan_cache WHERE key IN "
+                "(SELECT key FROM plan_cache ORDER BY last_used LIMIT ?)",
+                (count,)
+            )
+
+_plan_cache = None
+
+def get_plan_cache():
+    """Return the process-wide plan cache, falling back to a local cache if the shared store can't be opened"""
+    global _plan_cache
+    if _plan_cache is None:
+        if PLAN_CACHE_BACKEND == "sqlite":
+            try:
+                _plan_cache = SQLitePlanCache()
+            except (sqlite3.Error, OSError) as e:
+                logger.warning("Shared plan cache unavailable, using local cache: %s", e)
+                _plan_cache = LocalPlanCache()
+        else:
+            _plan_cache = LocalPlanCache()
+    return _plan_cache
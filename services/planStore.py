@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import sqlite3
+from typing import Dict, Optional
+from services.planCache import ThreadLocalConnection
+
+logger = logging.getLogger(__name__)
+
+PLAN_STORE_PATH = os.environ.get(
+    "PLAN_STORE_PATH",
+    os.path.join(tempfile.gettempdir(), "fit-formula-plans.db")
+)
+# Plans are dropped this many days after they were last generated or served from the cache
+PLAN_STORE_MAX_AGE_DAYS = float(os.environ.get("PLAN_STORE_MAX_AGE_DAYS", "90"))
+# Serving a plan from the cache refreshes its age at most this often, so most hits only read
+PLAN_STORE_REFRESH_INTERVAL = 24 * 60 * 60
+# Expired plans are purged from save_plan at most this often per process
+PLAN_STORE_PURGE_INTERVAL = 3600
+
+def make_plan_id(kind: str, content: Dict) -> str:
+    """Build a stable plan ID from a hash of the generated plan"""
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{kind}:{canonical}".encode()).hexdigest()[:32]
+
+class PlanStore:
+    """Generated plans persisted in a local SQLite database, looked up by plan ID"""
+
+    def __init__(self, path: str = PLAN_STORE_PATH, max_age_days: float = PLAN_STORE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_age = max_age_days * 24 * 60 * 60
+        self._connection = ThreadLocalConnection(path)
+        self._last_purge = 0.0
+        connection = self._connection()
+        # Every worker runs this at startup, so check and migrate the schema under
+        # the write lock to keep two of them from adding the same column
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS plans (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    structure TEXT,
+                    created_at REAL NOT NULL
+                )
+            """)
+            # Stores created before plans kept their structure need the column added
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(plans)")]
+            if "structure" not in columns:
+                connection.execute("ALTER TABLE plans ADD COLUMN structure TEXT")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS plans_created_at ON plans (created_at)"
+            )
+        self._purge_expired()
+
+    def _purge_expired(self):
+        """Delete plans older than the maximum age, walking the created_at index"""
+        now = time.time()
+        self._last_purge = now
+        self._connection().execute("DELETE FROM plans WHERE created_at < ?", (now - self.max_age,))
+
+    def save_plan(self, kind: str, request: Dict, content: Dict, structure: Optional[Dict] = None) -> Optional[str]:
+        """Store a generated plan and return its ID, or None if it couldn't be saved.
+
+        The structure is the plan's data before rendering, which lets later
+        edits rebuild only the parts that change.
+        """
+        plan_id = make_plan_id(kind, content)
+        try:
+            # The same plan always hashes to the same ID, so an existing row only
+            # needs its age reset and, for old rows, the structure filled in
+            self._connection().execute("""
+                INSERT INTO plans (id, kind, request, content, structure, created_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    structure = COALESCE(plans.structure, excluded.structure),
+                    created_at = excluded.created_at
+            """, (plan_id, kind, json.dumps(request), json.dumps(content),
+                  json.dumps(structure) if structure is not None else None, time.time()))
+            if time.time() - self._last_purge > PLAN_STORE_PURGE_INTERVAL:
+                self._purge_expired()
+        except sqlite3.Error as e:
+            logger.warning("Failed to save plan: %s", e)
+            return None
+        return plan_id
+
+    def refresh_plan(self, plan_id: str) -> bool:
+        """Reset the age of a plan served from the cache and report whether it is still stored.
+
+        If the store can't be read the plan is assumed to exist, so contention
+        doesn't cause plans to be regenerated.
+        """
+        try:
+            connection = self._connection()
+            row = connection.execute("SELECT created_at FROM plans WHERE id = ?", (plan_id,)).fetchone()
+            if row is None:
+                return False
+            now = time.time()
+            if now - row[0] > PLAN_STORE_REFRESH_INTERVAL:
+                connection.execute("UPDATE plans SET created_at = ? WHERE id = ?", (now, plan_id))
+        except sqlite3.Error as e:
+            logger.warning("Failed to refresh plan: %s", e)
+        return True
+
+    def get_plan(self, plan_id: str) -> Optional[Dict]:
+        """Look up a stored plan by ID, returning None if it doesn't exist or can't be read"""
+        try:
+            row = self._connection().execute(
+                "SELECT kind, request, content, structure FROM plans WHERE id = ?", (plan_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Failed to read plan: %s", e)
+            return None
+        if row is None:
+            return None
+        return {
+            "id": plan_id,
+            "kind": row[0],
+            "request": json.loads(row[1]),
+            "content": json.loads(row[2]),
+            "structure": json.loads(row[3]) if row[3] is not None else None
+        }
+
+class UnavailablePlanStore:
+    """Stand-in used when the database can't be opened; plans are served but not persisted"""
+
+    def save_plan(self, kind: str, request: Dict, content: Dict, structure: Optional[Dict] = None) -> Optional[str]:
+        return None
+
+    def refresh_plan(self, plan_id: str) -> bool:
+        return True
+
+    def get_plan(self, plan_id: str) -> Optional[Dict]:
+        return None
+
+_plan_store = None
+
+def get_plan_store():
+    """Return the process-wide plan store, or one that persists nothing if the database can't be opened"""
+    global _plan_store
+    if _plan_store is None:
+        try:
+            _plan_store = PlanStore()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Plan store unavailable, plans will not be persisted: %s", e)
+            _plan_store = UnavailablePlanStore()
+    return _plan_store
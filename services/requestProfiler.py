@@ -0,0 +1,153 @@
+import hashlib
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from services.logConfig import request_id_var
+
+logger = logging.getLogger(__name__)
+
+# Fraction of plan requests to profile; 0 profiles only requests carrying a valid token
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+# Shared secret for signed X-Profile-Token headers and the admin routes; empty disables both
+PROFILE_SECRET = os.environ.get("PROFILE_SECRET", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "fit-formula-profiles"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.002"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "100"))
+PROFILE_TOKEN_TTL = 300
+PROFILE_PATHS = frozenset(["/api/workout", "/api/meal-plan"])
+
+def profiling_enabled() -> bool:
+    """Whether any request could be profiled with the current configuration"""
+    return PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_SECRET)
+
+def sign_profile_token(timestamp: int, secret: str = PROFILE_SECRET) -> str:
+    """Build an X-Profile-Token value of the form '<timestamp>.<hmac>'"""
+    signature = hmac.new(secret.encode(), str(timestamp).encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}.{signature}"
+
+def verify_profile_token(token: str, secret: str = PROFILE_SECRET) -> bool:
+    """Check a signed profile token, rejecting ones older than PROFILE_TOKEN_TTL"""
+    if not secret:
+        return False
+    timestamp, _, _ = token.partition(".")
+    if not (timestamp.isascii() and timestamp.isdigit()) or abs(time.time() - int(timestamp)) > PROFILE_TOKEN_TTL:
+        return False
+    # Compare bytes: compare_digest raises TypeError for non-ASCII strings
+    return hmac.compare_digest(token.encode(), sign_profile_token(int(timestamp), secret).encode())
+
+class StackSampler:
+    """Statistical profiler that periodically samples one thread's stack from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+def _slugify(value: str) -> str:
+    """Reduce a path or client-supplied ID to a short string that is safe in a filename"""
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")[:64]
+
+def write_collapsed_profile(samples: Counter, path: str, request_id: Optional[str]) -> Optional[str]:
+    """Write samples in collapsed-stack format, readable by flamegraph.pl and speedscope"""
+    if not samples:
+        return None
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    # The request ID can come from the client's X-Request-ID header
+    tag = _slugify(request_id or "") or os.urandom(4).hex()
+    filename = f"{time.strftime('%Y%m%dT%H%M%S')}-{_slugify(path)}-{tag}.collapsed"
+    with open(os.path.join(PROFILE_DIR, filename), "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+    # Keep only the newest profiles
+    for old in list_profiles()[PROFILE_MAX_FILES:]:
+        os.remove(os.path.join(PROFILE_DIR, old["name"]))
+    return filename
+
+def list_profiles() -> List[Dict]:
+    """List saved profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".collapsed"):
+            stat = os.stat(os.path.join(PROFILE_DIR, name))
+            profiles.append({"name": name, "size": stat.st_size, "created": stat.st_mtime})
+    return sorted(profiles, key=lambda profile: profile["created"], reverse=True)
+
+def get_profile_path(name: str) -> Optional[str]:
+    """Resolve a profile name from list_profiles() to its file path"""
+    path = os.path.join(PROFILE_DIR, os.path.basename(name))
+    if not name.endswith(".collapsed") or not os.path.isfile(path):
+        return None
+    return path
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles a sample of plan requests.
+
+    Only installed when profiling_enabled(), so it costs nothing otherwise.
+    The sampler watches the thread running the request; other requests handled
+    on the same event loop at the same time show up in its samples too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _should_profile(self, scope) -> bool:
+        if scope["type"] != "http" or scope["path"] not in PROFILE_PATHS:
+            return False
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            return True
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                return verify_profile_token(value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            samples = sampler.stop()
+            try:
+                filename = write_collapsed_profile(samples, scope["path"], request_id_var.get())
+                if filename:
+                    logger.info("Saved request profile", extra={"fields": {"profile": filename}})
+            except OSError as e:
+                logger.warning("Failed to save request profile: %s", e)
@@ -0,0 +1,15 @@
+import hashlib
+from typing import Dict, Optional
+
+# Boilerplate plan sections, keyed by a hash of their content so clients can cache them forever
+_sections: Dict[str, Dict[str, str]] = {}
+
+def register_section(title: str, body: str) -> str:
+    """Register a static plan section and return its content-hash ID"""
+    section_id = hashlib.sha256(f"{title}\n{body}".encode()).hexdigest()[:16]
+    _sections[section_id] = {"id": section_id, "title": title, "body": body}
+    return section_id
+
+def get_section(section_id: str) -> Optional[Dict[str, str]]:
+    """Look up a static plan section by its ID"""
+    return _sections.get(section_id)
@@ -1,4 +1,11 @@
-from typing import List, Optional, Dict
+import logging
+import math
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+from services.imageAssets import get_exercise_type
+from services.staticSections import register_section
+
+logger = logging.getLogger(__name__)
 
 def get_exercises_by_equipment(equipment: List[str]) -> Dict[str, List[Dict[str, str]]]:
     """Get appropriate exercises based on available equipment"""
@@ -158,86 +165,423 @@ def get_workout_exercises(workout_type: str, available_exercises: Dict[str, List
     
     return exercises
 
-def generate_workout_plan(
-    fitness_level: str,
-    equipment_available: List[str],
-    goal: str,
-    time_available: int,
-    sessions_per_week: int,
-    medical_conditions: Optional[str] = None
-) -> str:
-    """Generate a personalized workout plan based on user parameters."""
-    
-    try:
-        # Get appropriate exercises based on equipment
-        available_exercises = get_exercises_by_equipment(equipment_available)
-        
-        # Get workout split based on sessions per week
-        workout_split = generate_workout_splits(sessions_per_week)
-        
-        # Create workout plan introduction
-        plan = f"""# Your Personalized {goal} Workout Plan
+MAX_PROGRAM_WEEKS = 12
+MAX_SETS = 6
 
-## Weekly Overview
-This {sessions_per_week}-day workout plan is designed for a {fitness_level}-level individual focusing on {goal.lower()}. Each session lasts approximately {time_available} minutes and includes warm-up, main exercises, and cool-down stretches. Rest days are essential for muscle recovery and growth.
+# Training phases repeat in four-week blocks
+PERIODIZATION_CYCLE = ["Accumulation", "Accumulation", "Intensification", "Deload"]
 
-"""
+PHASE_DESCRIPTIONS = {
+    "Accumulation": "Build volume: sets go up while reps stay in the target range.",
+    "Intensification": "Fewer reps with longer rest - use heavier loads or harder variations.",
+    "Deload": "Half the usual sets at normal reps and rest so you recover before the next block."
+}
 
-        # Add each day's workout
-        for day_num, workout_type in enumerate(workout_split, 1):
-            if workout_type == "Rest":
-                plan += f"""## Day {day_num} - Rest and Recovery
-* Light stretching
+REST_DAY_ACTIVITIES = """* Light stretching
 * Foam rolling
 * Walking or light cardio (optional)
 * Focus on proper nutrition and hydration
-
 """
-            else:
-                plan += f"""## Day {day_num} - {workout_type}
 
-### Warm-up (10-15 minutes)
-* 5 minutes of light cardio (jumping jacks, jump rope, or jogging)
+WARM_UP = """* 5 minutes of light cardio (jumping jacks, jump rope, or jogging)
 * Dynamic stretches for major muscle groups
 * Joint mobility exercises
-
-### Main Exercises
-"""
-                # Get exercises for this workout type
-                exercises = get_workout_exercises(workout_type, available_exercises)
-                
-                for exercise in exercises:
-                    plan += f"""* {exercise['name']}: {exercise['sets']} sets × {exercise['reps']}, {exercise['rest']}
-  - Form Cue: {exercise['cue']}
 """
 
-                plan += """
-### Cool-down (5-10 minutes)
-* Static stretching for worked muscle groups
+COOL_DOWN = """* Static stretching for worked muscle groups
 * Light walking to normalize heart rate
 * Stay hydrated
-
 """
 
-        # Add general guidelines
-        plan += """## General Guidelines
-* Always warm up properly before each workout
+GENERAL_GUIDELINES = """* Always warm up properly before each workout
 * Focus on proper form over reps
 * Stay hydrated throughout your workouts
 * Get adequate sleep (7-9 hours) to support recovery
 * If you experience sharp pain (not normal muscle fatigue), stop and consult a professional
 * Adjust intensity based on your recovery and progression
+"""
 
-## Progression Tips
-* Start with the lower end of the rep ranges
+PROGRESSION_TIPS = """* Start with the lower end of the rep ranges
 * When you can complete all sets at the max reps with good form, increase difficulty:
   - For bodyweight exercises: modify to a harder variation
   - For weighted exercises: increase weight by 2-5%
 * Listen to your body and progress at your own pace
 * Rest between sets is crucial - use the recommended rest periods"""
 
-        return plan
+PERIODIZATION_TIPS = """* Follow the sets, reps and rest listed for each week - they change from week to week
+* In accumulation weeks, keep the same weights and add the extra set
+* In intensification weeks, increase weight by 2-5% or move to a harder variation
+* Don't skip deload weeks - they are when your body adapts to the training
+* Each new block starts slightly above the volume of the one before"""
+
+# Static sections shared by every plan, referenced by ID in structured responses
+WORKOUT_SECTIONS = {
+    "rest_day": register_section("Rest and Recovery", REST_DAY_ACTIVITIES),
+    "warm_up": register_section("Warm-up (10-15 minutes)", WARM_UP),
+    "cool_down": register_section("Cool-down (5-10 minutes)", COOL_DOWN),
+    "guidelines": register_section("General Guidelines", GENERAL_GUIDELINES),
+    "progression_tips": register_section("Progression Tips", PROGRESSION_TIPS),
+    "periodization": register_section("Periodization", PERIODIZATION_TIPS)
+}
+
+PHASE_SECTIONS = {
+    phase: register_section(f"{phase} Phase", description)
+    for phase, description in PHASE_DESCRIPTIONS.items()
+}
+
+def _adjust_numbers(value: str, adjust) -> str:
+    """Apply an adjustment to every number in a sets or reps prescription"""
+    adjusted = re.sub(r"\d+", lambda match: str(adjust(int(match.group()))), value)
+    # Collapse ranges that adjusted down to a single number, e.g. "3-3"
+    return re.sub(r"\b(\d+)-\1\b", r"\1", adjusted)
+
+def _adjust_rest(rest: str, extra_seconds: int) -> str:
+    """Lengthen a rest prescription such as '90 seconds' or '2-3 minutes'"""
+    match = re.fullmatch(r"(\d+)(?:-(\d+))? (seconds|minutes)", rest)
+    if not extra_seconds or not match:
+        return rest
+
+    unit = 60 if match.group(3) == "minutes" else 1
+    values = [int(v) * unit + extra_seconds for v in match.groups()[:2] if v]
+    if all(v % 60 == 0 for v in values):
+        return "-".join(str(v // 60) for v in values) + " minutes"
+    return "-".join(str(v) for v in values) + " seconds"
+
+def adjust_exercise(exercise: Dict, adjustments: Dict) -> Dict:
+    """Apply a week's set, rep and rest adjustments to an exercise's base prescription"""
+    base = exercise["base"]
+    return {
+        **exercise,
+        "sets": _adjust_numbers(base["sets"], lambda n: max(
+            1, math.ceil(min(n + adjustments["extra_sets"], MAX_SETS) * adjustments["set_scale"])
+        )),
+        "reps": _adjust_numbers(base["reps"], lambda n: max(1, round(n * adjustments["rep_scale"]))),
+        "rest": _adjust_rest(base["rest"], adjustments["extra_rest"])
+    }
+
+def build_workout_day(day_num: int, workout_type: str, available_exercises: Dict[str, List[Dict[str, str]]]) -> Dict:
+    """Build one day of the first week, keeping each exercise's base prescription for later weeks"""
+    exercises = []
+    if workout_type != "Rest":
+        for exercise in get_workout_exercises(workout_type, available_exercises):
+            exercises.append({
+                **exercise,
+                "base": {"sets": exercise["sets"], "reps": exercise["reps"], "rest": exercise["rest"]}
+            })
+    return {"day": day_num, "type": workout_type, "exercises": exercises}
+
+def adjust_day(day: Dict, adjustments: Dict) -> Dict:
+    """Apply a week's adjustments to every exercise in a day"""
+    return {**day, "exercises": [adjust_exercise(exercise, adjustments) for exercise in day["exercises"]]}
+
+def build_workout_week(available_exercises: Dict[str, List[Dict[str, str]]], workout_split: List[str]) -> Dict:
+    """Build the structured plan for the first week of the program"""
+    return {
+        "week": 1,
+        "phase": PERIODIZATION_CYCLE[0],
+        "adjustments": {"extra_sets": 0, "set_scale": 1.0, "rep_scale": 1.0, "extra_rest": 0},
+        "days": [
+            build_workout_day(day_num, workout_type, available_exercises)
+            for day_num, workout_type in enumerate(workout_split, 1)
+        ]
+    }
+
+def derive_next_week(week: Dict) -> Dict:
+    """Derive the following week of the program from the previous week's plan"""
+    week_num = week["week"] + 1
+    phase = PERIODIZATION_CYCLE[(week_num - 1) % len(PERIODIZATION_CYCLE)]
+    adjustments = dict(week["adjustments"])
+
+    if phase == "Accumulation":
+        if week["phase"] == "Deload":
+            # Start the new block at the volume the previous block peaked at
+            adjustments.update(set_scale=1.0, rep_scale=1.0, extra_rest=0)
+        else:
+            adjustments["extra_sets"] += 1
+    elif phase == "Intensification":
+        adjustments.update(rep_scale=0.75, extra_rest=adjustments["extra_rest"] + 30)
+    elif phase == "Deload":
+        adjustments.update(set_scale=0.5, rep_scale=1.0, extra_rest=0)
+
+    return {
+        "week": week_num,
+        "phase": phase,
+        "adjustments": adjustments,
+        "days": [adjust_day(day, adjustments) for day in week["days"]]
+    }
+
+def build_workout_program(
+    equipment_available: List[str],
+    sessions_per_week: int,
+    weeks: int = 1
+) -> Iterator[Dict]:
+    """Yield the structured plan for each week, deriving every week from the one before"""
+    # Get appropriate exercises based on equipment
+    available_exercises = get_exercises_by_equipment(equipment_available)
+
+    # Get workout split based on sessions per week
+    workout_split = generate_workout_splits(sessions_per_week)
+
+    week = build_workout_week(available_exercises, workout_split)
+    yield week
+    for _ in range(1, weeks):
+        week = derive_next_week(week)
+        yield week
+
+def render_workout_day(day: Dict, heading: str = "##") -> str:
+    """Render one day of a workout week as markdown"""
+    if day["type"] == "Rest":
+        return f"{heading} Day {day['day']} - Rest and Recovery\n{REST_DAY_ACTIVITIES}\n"
+
+    text = f"""{heading} Day {day['day']} - {day['type']}
+
+{heading}# Warm-up (10-15 minutes)
+{WARM_UP}
+{heading}# Main Exercises
+"""
+    for exercise in day["exercises"]:
+        text += f"""* {exercise['name']}: {exercise['sets']} sets × {exercise['reps']}, {exercise['rest']}
+  - Form Cue: {exercise['cue']}
+"""
+
+    text += f"""
+{heading}# Cool-down (5-10 minutes)
+{COOL_DOWN}
+"""
+    return text
+
+def render_workout_week(week: Dict, multi_week: bool = False) -> str:
+    """Render a week of the program as markdown"""
+    if not multi_week:
+        return "".join(render_workout_day(day) for day in week["days"])
+
+    text = f"## Week {week['week']} - {week['phase']}\n{PHASE_DESCRIPTIONS[week['phase']]}\n\n"
+    return text + "".join(render_workout_day(day, "###") for day in week["days"])
+
+def get_workout_overview(
+    fitness_level: str,
+    goal: str,
+    time_available: int,
+    sessions_per_week: int,
+    weeks: int = 1
+) -> str:
+    """Describe the plan for the overview section"""
+    overview = f"This {sessions_per_week}-day workout plan is designed for a {fitness_level}-level individual focusing on {goal.lower()}. Each session lasts approximately {time_available} minutes and includes warm-up, main exercises, and cool-down stretches. Rest days are essential for muscle recovery and growth."
+    if weeks > 1:
+        overview += f" The program runs for {weeks} weeks in four-week blocks of accumulation, intensification and deload."
+    return overview
+
+def structure_workout_week(week: Dict, exercise_index: Dict[str, int]) -> Dict:
+    """Convert a week of the program to its structured response form.
+
+    Exercises refer by index to the plan-level exercise list, so each week
+    carries only the prescription that changes from week to week.
+    """
+    days = []
+    for day in week["days"]:
+        if day["type"] == "Rest":
+            sections = [WORKOUT_SECTIONS["rest_day"]]
+        else:
+            sections = [WORKOUT_SECTIONS["warm_up"], WORKOUT_SECTIONS["cool_down"]]
+        days.append({
+            "day": day["day"],
+            "type": day["type"],
+            "sections": sections,
+            "exercises": [
+                {
+                    "exercise": exercise_index[exercise["name"]],
+                    "sets": exercise["sets"],
+                    "reps": exercise["reps"],
+                    "rest": exercise["rest"]
+                }
+                for exercise in day["exercises"]
+            ]
+        })
+
+    return {
+        "week": week["week"],
+        "phase": week["phase"],
+        "phase_section": PHASE_SECTIONS[week["phase"]],
+        "days": days
+    }
+
+def build_workout_structure(
+    fitness_level: str,
+    equipment_available: List[str],
+    goal: str,
+    time_available: int,
+    sessions_per_week: int,
+    medical_conditions: Optional[str] = None,
+    weeks: int = 1
+) -> Dict:
+    """Build a workout plan as data, before it's rendered in either response format"""
+    params = {
+        "fitness_level": fitness_level,
+        "equipment_available": equipment_available,
+        "goal": goal,
+        "time_available": time_available,
+        "sessions_per_week": sessions_per_week,
+        "medical_conditions": medical_conditions,
+        "weeks": weeks
+    }
+    return {
+        "params": params,
+        "weeks": list(build_workout_program(equipment_available, sessions_per_week, weeks))
+    }
+
+def _same_exercises(old_day: Dict, new_day: Dict) -> bool:
+    """Whether two days have the same type and base exercise prescriptions"""
+    return old_day["type"] == new_day["type"] and (
+        [(exercise["name"], exercise["base"]) for exercise in old_day["exercises"]] ==
+        [(exercise["name"], exercise["base"]) for exercise in new_day["exercises"]]
+    )
+
+def patch_workout_structure(structure: Dict, params: Dict) -> Dict:
+    """Update a workout plan for changed parameters, rebuilding only the days they affect.
+
+    Equipment only feeds the exercise blocks and sessions per week only the
+    split, so after re-running selection any day that comes out the same keeps
+    its existing entry in every week. Changing the number of weeks derives or
+    drops weeks at the end; the remaining fields only appear in the overview.
+    """
+    old_params = structure["params"]
+    weeks = structure["weeks"]
+
+    if (params["equipment_available"] != old_params["equipment_available"]
+            or params["sessions_per_week"] != old_params["sessions_per_week"]):
+        available_exercises = get_exercises_by_equipment(params["equipment_available"])
+        workout_split = generate_workout_splits(params["sessions_per_week"])
+        old_days = weeks[0]["days"]
+
+        new_days = {}
+        for index, workout_type in enumerate(workout_split):
+            day = build_workout_day(index + 1, workout_type, available_exercises)
+            if index >= len(old_days) or not _same_exercises(old_days[index], day):
+                new_days[index] = day
+
+        weeks = [
+            {
+                **week,
+                "days": [
+                    adjust_day(new_days[index], week["adjustments"]) if index in new_days else week["days"][index]
+                    for index in range(len(workout_split))
+                ]
+            }
+            for week in weeks
+        ]
+
+    week_count = params["weeks"]
+    weeks = weeks[:week_count]
+    while len(weeks) < week_count:
+        weeks.append(derive_next_week(weeks[-1]))
+
+    return {"params": params, "weeks": weeks}
+
+def structure_workout_plan(structure: Dict) -> Dict:
+    """Build the structured form of a workout plan.
+
+    Boilerplate such as the warm-up, cool-down and guidelines is not repeated
+    inline; days and the plan itself list the IDs of the static sections they
+    use, which clients fetch once from /api/sections/{id}. Likewise each
+    exercise's name and cue are listed once for the whole plan and the weeks
+    refer to them by index. An exercise's image names its sprite in the
+    image atlas served from /api/images/atlas.
+    """
+    params = structure["params"]
+    tips = "periodization" if params["weeks"] > 1 else "progression_tips"
+
+    exercises = []
+    exercise_index = {}
+    for week in structure["weeks"]:
+        for day in week["days"]:
+            for exercise in day["exercises"]:
+                if exercise["name"] not in exercise_index:
+                    exercise_index[exercise["name"]] = len(exercises)
+                    exercises.append({
+                        "name": exercise["name"],
+                        "cue": exercise["cue"],
+                        "image": get_exercise_type(exercise["name"])
+                    })
+
+    return {
+        "format": "structured",
+        "title": f"Your Personalized {params['goal']} Workout Plan",
+        "overview": get_workout_overview(
+            params["fitness_level"], params["goal"], params["time_available"],
+            params["sessions_per_week"], params["weeks"]
+        ),
+        "exercises": exercises,
+        "weeks": [structure_workout_week(week, exercise_index) for week in structure["weeks"]],
+        "sections": [WORKOUT_SECTIONS["guidelines"], WORKOUT_SECTIONS[tips]]
+    }
+
+def _render_workout_plan(params: Dict, weeks: Iterable[Dict]) -> Iterator[str]:
+    """Render the introduction, each week and the guidelines of a workout plan in turn"""
+    multi_week = params["weeks"] > 1
+
+    # Create workout plan introduction
+    yield f"""# Your Personalized {params['goal']} Workout Plan
+
+## Weekly Overview
+{get_workout_overview(params["fitness_level"], params["goal"], params["time_available"], params["sessions_per_week"], params["weeks"])}
+
+"""
+
+    for week in weeks:
+        yield render_workout_week(week, multi_week)
+
+    # Add general guidelines
+    tips_title, tips = ("Periodization", PERIODIZATION_TIPS) if multi_week else ("Progression Tips", PROGRESSION_TIPS)
+    yield f"""## General Guidelines
+{GENERAL_GUIDELINES}
+## {tips_title}
+{tips}"""
+
+def render_workout_plan(structure: Dict) -> str:
+    """Render a workout plan structure as markdown"""
+    return "".join(_render_workout_plan(structure["params"], structure["weeks"]))
+
+def iter_workout_plan(
+    fitness_level: str,
+    equipment_available: List[str],
+    goal: str,
+    time_available: int,
+    sessions_per_week: int,
+    medical_conditions: Optional[str] = None,
+    weeks: int = 1
+) -> Iterator[str]:
+    """Lazily render a workout plan, yielding the introduction, each week and the guidelines in turn"""
+    params = {
+        "fitness_level": fitness_level,
+        "goal": goal,
+        "time_available": time_available,
+        "sessions_per_week": sessions_per_week,
+        "weeks": weeks
+    }
+    return _render_workout_plan(params, build_workout_program(equipment_available, sessions_per_week, weeks))
+
+def generate_workout_plan(
+    fitness_level: str,
+    equipment_available: List[str],
+    goal: str,
+    time_available: int,
+    sessions_per_week: int,
+    medical_conditions: Optional[str] = None,
+    weeks: int = 1
+) -> str:
+    """Generate a personalized workout plan based on user parameters."""
+    
+    try:
+        return render_workout_plan(build_workout_structure(
+            fitness_level=fitness_level,
+            equipment_available=equipment_available,
+            goal=goal,
+            time_available=time_available,
+            sessions_per_week=sessions_per_week,
+            medical_conditions=medical_conditions,
+            weeks=weeks
+        ))
         
     except Exception as e:
-        print(f"Error generating workout plan: {str(e)}")
+        logger.error("Error generating workout plan: %s", e)
         raise Exception(f"Failed to generate workout plan: {str(e)}")
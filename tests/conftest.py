@@ -0,0 +1,12 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.planCache import LocalPlanCache
+from services.planStore import PlanStore
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "plan_store", PlanStore(str(tmp_path / "plans.db")))
+    monkeypatch.setattr(main, "plan_cache", LocalPlanCache())
+    return TestClient(main.app)
@@ -0,0 +1,15 @@
+from services.corsPolicy import ALLOWED_ORIGINS
+
+def test_preflight_allows_any_requested_header(client):
+    response = client.options("/api/workout", headers={
+        "Origin": ALLOWED_ORIGINS[0],
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "authorization, cache-control, x-admin-token",
+    })
+    assert response.status_code == 204
+    assert response.headers["access-control-allow-origin"] == ALLOWED_ORIGINS[0]
+    assert response.headers["access-control-allow-headers"] == "authorization, cache-control, x-admin-token"
+
+def test_every_response_varies_by_origin(client):
+    for headers in ({}, {"Origin": "https://example.com"}, {"Origin": ALLOWED_ORIGINS[0]}):
+        assert client.get("/api/test", headers=headers).headers["vary"] == "Origin"
@@ -0,0 +1,15 @@
+import pytest
+
+from services.mealPlanGeneration import DAILY_PICKS, MAX_PLAN_DAYS, build_meal_day
+
+@pytest.mark.parametrize("diet", list(DAILY_PICKS))
+def test_every_day_of_the_longest_plan_is_different(diet):
+    days = [build_meal_day(diet, day_index, 2000)["meals"] for day_index in range(MAX_PLAN_DAYS)]
+    assert len({repr(meals) for meals in days}) == MAX_PLAN_DAYS
+
+@pytest.mark.parametrize("diet", list(DAILY_PICKS))
+def test_consecutive_days_differ_in_every_meal(diet):
+    days = [build_meal_day(diet, day_index, 2000)["meals"] for day_index in range(MAX_PLAN_DAYS)]
+    for today, tomorrow in zip(days, days[1:]):
+        for meal, next_meal in zip(today, tomorrow):
+            assert meal["items"] != next_meal["items"]
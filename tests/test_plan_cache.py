@@ -0,0 +1,39 @@
+import sqlite3
+
+import main
+from services import planCache
+from services.planCache import SQLitePlanCache
+from services.planStore import UnavailablePlanStore
+
+MEAL_REQUEST = {
+    "age": 40,
+    "gender": "male",
+    "weight": 190,
+    "height": 70,
+    "activity_level": "lightly active",
+    "goal": "maintain",
+    "dietary_restrictions": ["carnivore"],
+}
+
+def test_hit_survives_a_failed_touch(tmp_path, monkeypatch):
+    monkeypatch.setattr(planCache, "PLAN_CACHE_BUSY_TIMEOUT", 0.01)
+    monkeypatch.setattr(planCache, "PLAN_CACHE_TOUCH_INTERVAL", -1)
+    path = str(tmp_path / "cache.db")
+    cache = SQLitePlanCache(path)
+    cache.set("plan", {"plan_id": "abc"})
+
+    # Another writer holds the lock, so refreshing last_used fails
+    locker = sqlite3.connect(path, isolation_level=None)
+    locker.execute("BEGIN IMMEDIATE")
+    try:
+        assert cache.get("plan") == {"plan_id": "abc"}
+    finally:
+        locker.execute("ROLLBACK")
+
+def test_unsaved_plans_are_not_cached(client, monkeypatch):
+    monkeypatch.setattr(main, "plan_store", UnavailablePlanStore())
+
+    response = client.post("/api/meal-plan", json=MEAL_REQUEST)
+    assert response.status_code == 200
+    assert response.json()["plan_id"] is None
+    assert main.plan_cache.get(main.make_cache_key("meal-plan", main.MealPlanRequest(**MEAL_REQUEST).model_dump())) is None
@@ -0,0 +1,48 @@
+import time
+
+import main
+
+WORKOUT_REQUEST = {
+    "fitness_level": "beginner",
+    "available_equipment": ["bodyweight_only"],
+    "goals": "General Fitness",
+    "time_per_session": 30,
+    "sessions_per_week": 3,
+}
+
+def set_age(plan_id, days):
+    main.plan_store._connection().execute(
+        "UPDATE plans SET created_at = ? WHERE id = ?", (time.time() - days * 24 * 60 * 60, plan_id)
+    )
+
+def get_created_at(plan_id):
+    return main.plan_store._connection().execute(
+        "SELECT created_at FROM plans WHERE id = ?", (plan_id,)
+    ).fetchone()[0]
+
+def test_cached_plan_is_saved_again_after_expiring(client):
+    plan_id = client.post("/api/workout", json=WORKOUT_REQUEST).json()["plan_id"]
+    set_age(plan_id, main.plan_store.max_age / (24 * 60 * 60) + 1)
+    main.plan_store._purge_expired()
+    assert client.get(f"/api/plans/{plan_id}").status_code == 404
+
+    # Still cached, but the plan is regenerated and stored again under the same ID
+    assert client.post("/api/workout", json=WORKOUT_REQUEST).json()["plan_id"] == plan_id
+    assert client.get(f"/api/plans/{plan_id}").status_code == 200
+    assert client.patch(f"/api/plans/{plan_id}", json={"weeks": 2}).status_code == 200
+
+def test_serving_from_the_cache_resets_the_plan_age(client):
+    plan_id = client.post("/api/workout", json=WORKOUT_REQUEST).json()["plan_id"]
+    set_age(plan_id, 89)
+
+    client.post("/api/workout", json=WORKOUT_REQUEST)
+    assert time.time() - get_created_at(plan_id) < 60
+
+def test_saving_again_resets_the_plan_age(client):
+    request = main.WorkoutRequest(**WORKOUT_REQUEST)
+    content = {"workout_plan": "plan"}
+    plan_id = main.plan_store.save_plan("workout", request.model_dump(), content)
+    set_age(plan_id, 89)
+
+    assert main.plan_store.save_plan("workout", request.model_dump(), content) == plan_id
+    assert time.time() - get_created_at(plan_id) < 60
@@ -0,0 +1,87 @@
+import pytest
+
+import main
+
+WORKOUT_REQUEST = {
+    "fitness_level": "intermediate",
+    "available_equipment": ["dumbbells"],
+    "goals": "Build Muscle",
+    "time_per_session": 45,
+    "sessions_per_week": 3,
+    "weeks": 4,
+}
+
+MEAL_REQUEST = {
+    "age": 30,
+    "gender": "female",
+    "weight": 65,
+    "height": 170,
+    "activity_level": "moderately active",
+    "goal": "lose weight",
+    "dietary_restrictions": ["pescatarian"],
+    "days": 5,
+}
+
+WORKOUT_CHANGES = [
+    {"weeks": 8},
+    {"weeks": 1},
+    {"sessions_per_week": 5},
+    {"sessions_per_week": 2},
+    {"available_equipment": ["barbell", "resistance_bands"]},
+    {"available_equipment": ["dumbbells", "bodyweight_only"], "sessions_per_week": 4, "weeks": 6},
+    {"goals": "Lose Weight", "time_per_session": 30, "fitness_level": "beginner"},
+]
+
+MEAL_CHANGES = [
+    {"days": 12},
+    {"days": 1},
+    {"weight": 80, "goal": "gain muscle"},
+    {"activity_level": "very active", "age": 45},
+    {"dietary_restrictions": ["carnivore"]},
+    {"dietary_restrictions": ["vegan"], "days": 3},
+]
+
+def assert_patch_matches_regeneration(client, path, request, changes):
+    # Generate the expected plan first so the patch can't be served from the cache
+    expected = client.post(path, json={**request, **changes})
+    assert expected.status_code == 200
+
+    plan_id = client.post(path, json=request).json()["plan_id"]
+    patched = client.patch(f"/api/plans/{plan_id}", json=changes)
+    assert patched.status_code == 200
+    assert patched.json() == expected.json()
+
+@pytest.mark.parametrize("format", ["markdown", "structured"])
+@pytest.mark.parametrize("changes", WORKOUT_CHANGES)
+def test_workout_patch_matches_regeneration(client, changes, format):
+    assert_patch_matches_regeneration(client, "/api/workout", {**WORKOUT_REQUEST, "format": format}, changes)
+
+@pytest.mark.parametrize("format", ["markdown", "structured"])
+@pytest.mark.parametrize("changes", MEAL_CHANGES)
+def test_meal_plan_patch_matches_regeneration(client, changes, format):
+    assert_patch_matches_regeneration(client, "/api/meal-plan", {**MEAL_REQUEST, "format": format}, changes)
+
+def test_patch_rebuilds_plans_stored_without_structure(client):
+    expected = client.post("/api/workout", json={**WORKOUT_REQUEST, "weeks": 2}).json()
+
+    request = main.WorkoutRequest(**WORKOUT_REQUEST)
+    structure = main.build_workout_structure(**main.get_workout_params(request))
+    content = main.render_workout_content(structure, request.format)
+    plan_id = main.plan_store.save_plan("workout", request.model_dump(), content)
+
+    patched = client.patch(f"/api/plans/{plan_id}", json={"weeks": 2})
+    assert patched.status_code == 200
+    assert patched.json() == expected
+
+def test_patch_rejects_invalid_bodies(client):
+    plan_id = client.post("/api/meal-plan", json=MEAL_REQUEST).json()["plan_id"]
+
+    assert client.patch(f"/api/plans/{plan_id}", json=[1]).status_code == 400
+    assert client.patch(f"/api/plans/{plan_id}", content=b"not json").status_code == 400
+    assert client.patch(f"/api/plans/{plan_id}", json={"days": 0}).status_code == 422
+    assert client.patch(f"/api/plans/{plan_id}", json={"weight": "heavy"}).status_code == 422
+    assert client.patch("/api/plans/missing", json={"days": 2}).status_code == 404
+
+def test_unknown_format_is_rejected(client):
+    assert client.post("/api/workout", json={**WORKOUT_REQUEST, "format": "structurd"}).status_code == 422
+    assert client.post("/api/meal-plan", json={**MEAL_REQUEST, "format": "json"}).status_code == 422
@@ -0,0 +1,40 @@
+import sqlite3
+import threading
+
+from services.planStore import PlanStore
+
+def test_workers_migrate_an_old_store_concurrently(tmp_path):
+    path = str(tmp_path / "plans.db")
+    connection = sqlite3.connect(path)
+    connection.execute("""
+        CREATE TABLE plans (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            request TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    connection.close()
+
+    workers = 8
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def open_store():
+        barrier.wait()
+        try:
+            PlanStore(path)
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=open_store) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    store = PlanStore(path)
+    plan_id = store.save_plan("workout", {}, {"workout_plan": "plan"}, {"weeks": []})
+    assert store.get_plan(plan_id)["structure"] == {"weeks": []}
@@ -0,0 +1,17 @@
+import time
+
+import main
+from services.requestProfiler import sign_profile_token, verify_profile_token
+
+SECRET = "profile-secret"
+
+def test_verify_profile_token_rejects_non_ascii_tokens():
+    now = int(time.time())
+    assert verify_profile_token(sign_profile_token(now, SECRET), SECRET)
+    assert not verify_profile_token(f"{now}.é", SECRET)
+    assert not verify_profile_token("²." + "0" * 64, SECRET)
+
+def test_admin_routes_reject_non_ascii_tokens(client, monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_SECRET", SECRET)
+    assert client.get("/api/admin/profiles", headers={"X-Admin-Token": "é".encode()}).status_code == 404
+    assert client.get("/api/admin/profiles", headers={"X-Admin-Token": SECRET}).status_code == 200